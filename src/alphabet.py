@@ -3,6 +3,8 @@
 from __future__ import annotations
 from typing import Iterable
 from array import array
+import numpy as np
+import numpy.typing as npt
 
 
 class Alphabet:
@@ -111,16 +113,18 @@ class Alphabet:
         return alpha.map_with_sentinel(x), alpha
 
     @staticmethod
-    def mapped_subseq_with_sentinel(x: str) -> tuple[array, Alphabet]:
+    def mapped_subseq_with_sentinel(x: str) \
+            -> tuple[npt.NDArray[np.uint8], Alphabet]:
         """
         Create mapped string with corresponding alphabet.
 
         Creates an alphabet from x, maps x to theh alphabet,
         then returns the mapped string and the alphabet.
         The mapped string is terminated by the sentinel (zero) byte.
-        The resulting string is a SubSeq[int], unlike
+        The resulting string is a NumPy uint8 array, unlike
         mapped_string_with_sentinel(x) which
-        returns a bytearray for the mapped string.
+        returns a bytearray for the mapped string; the array is a
+        view of the bytearray, so we don't copy the string.
         """
         x_, alpha = Alphabet.mapped_string_with_sentinel(x)
-        return array('l', (a for a in x_)), alpha
+        return np.frombuffer(x_, dtype=np.uint8), alpha
@@ -2,6 +2,12 @@
 
 import enum
 import re
+from typing import (
+    Sequence,
+    TypeVar
+)
+
+T = TypeVar('T')
 
 
 class Edit(enum.Enum):
@@ -17,6 +23,10 @@ EDIT_TO_CIGAR_MAP = {
     Edit.INSERT: "I",
     Edit.DELETE: "D"
 }
+# The same map for edits given as their Edit.value codes
+EDIT_CODE_TO_CIGAR_MAP = {
+    edit.value: cigar for edit, cigar in EDIT_TO_CIGAR_MAP.items()
+}
 CIGAR_TO_EDIT_MAP = {
     "M": Edit.MATCH,
     "I": Edit.INSERT,
@@ -24,21 +34,80 @@ CIGAR_TO_EDIT_MAP = {
 }
 
 
-def edits_to_cigar(edits: list[Edit]) -> str:
-    """Translate a list of edits into a cigar."""
+def _runs_to_cigar(edits: Sequence[T], edit_map: dict[T, str]) -> str:
+    """Translate a sequence of edits into a cigar through edit_map."""
     res: list[str] = []
     i = 0
     while i < len(edits):
         j = i + 1
         while j < len(edits) and edits[i] == edits[j]:
             j += 1
-        res.append(f"{j-i}{EDIT_TO_CIGAR_MAP[edits[i]]}")
+        res.append(f"{j-i}{edit_map[edits[i]]}")
         i = j
     return ''.join(res)
 
 
-def cigar_to_edits(cigar: str) -> list[Edit]:
+def edits_to_cigar(edits: list[Edit]) -> str:
+    """Translate a list of edits into a cigar."""
+    return _runs_to_cigar(edits, EDIT_TO_CIGAR_MAP)
+
+
+def edit_codes_to_cigar(codes: bytes | bytearray) -> str:
+    """Translate edits, stored as their Edit.value bytes, into a cigar."""
+    return _runs_to_cigar(codes, EDIT_CODE_TO_CIGAR_MAP)
+
+
+class LazyCigar:
+    """
+    A cigar that is only built when it is needed.
+
+    Holds the edit operations, as Edit.value bytes in the order the
+    (backwards) search found them, and translates them into the cigar
+    string the first time it is converted with str(). Hits that never
+    print their cigar never pay for building it.
+    """
+
+    __slots__ = ('_edits', '_cigar')
+
+    _edits: bytes
+    _cigar: str | None
+
+    def __init__(self, edits: bytes) -> None:
+        """Wrap edits, given in reverse order, for later translation."""
+        self._edits = edits
+        self._cigar = None
+
+    def __str__(self) -> str:
+        """Build the cigar, or return it if we already did."""
+        if self._cigar is None:
+            self._cigar = edit_codes_to_cigar(self._edits[::-1])
+        return self._cigar
+
+    def edits(self) -> list[Edit]:
+        """Get the edits in the order they align the pattern."""
+        return [Edit(code) for code in reversed(self._edits)]
+
+    def __repr__(self) -> str:
+        """Show the cigar as the string it represents."""
+        return f"LazyCigar({str(self)!r})"
+
+    def __eq__(self, other: object) -> bool:
+        """Compare with other lazy cigars or with cigar strings."""
+        if isinstance(other, LazyCigar):
+            return self._edits == other._edits
+        if isinstance(other, str):
+            return str(self) == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        """Hash as the cigar string, consistent with __eq__."""
+        return hash(str(self))
+
+
+def cigar_to_edits(cigar: str | LazyCigar) -> list[Edit]:
     """Translate a cigar into a list of edits."""
+    if isinstance(cigar, LazyCigar):
+        return cigar.edits()
     res: list[Edit] = []
     groups = re.findall(r"\d+\D", cigar, flags=re.ASCII)
     for group in groups:
@@ -49,7 +118,8 @@ def cigar_to_edits(cigar: str) -> list[Edit]:
     return res
 
 
-def extract_alignment(x: str, p: str, pos: int, cigar: str) -> tuple[str, str]:
+def extract_alignment(x: str, p: str, pos: int,
+                      cigar: str | LazyCigar) -> tuple[str, str]:
     """Extract a local alignment from a string, read, position and cigar."""
     i, j = pos, 0
     x_, p_ = [], []
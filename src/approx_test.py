@@ -4,8 +4,10 @@ from approx import (
     Edit,
     cigar_to_edits,
     count_edits,
+    edit_codes_to_cigar,
     edits_to_cigar,
-    extract_alignment
+    extract_alignment,
+    LazyCigar
 )
 
 
@@ -15,6 +17,10 @@ def test_cigar_mapping() -> None:
     cigar = edits_to_cigar(edits)
     edits2 = cigar_to_edits(cigar)
     assert edits == edits2
+    assert edit_codes_to_cigar(bytes(e.value for e in edits)) == cigar
+    lazy = LazyCigar(bytes(e.value for e in reversed(edits)))
+    assert lazy == cigar and str(lazy) == cigar
+    assert cigar_to_edits(lazy) == edits
 
 
 def test_extract_and_count() -> None:
@@ -1,32 +1,63 @@
 """Implementatin of the Burrows-Wheeler transform and related algorithms."""
 
 from typing import (
+    Any,
+    Iterable,
     Iterator,
     Callable,
     NamedTuple
 )
+import hashlib
+import os
+import shutil
+import tempfile
 import numpy as np
 import numpy.typing as npt
-from array import array
 from collections import Counter
 from alphabet import Alphabet
 from sais import sais_alphabet
+from jit import HAVE_NUMBA, njit
+from rank import (
+    RankBitmap,
+    RankTable,
+    build_rank_bitmap,
+    build_rank_table,
+    is_set,
+    rank,
+    rank_row
+)
 # from prefix_dub import prefix_doubling
 from approx import (
     Edit,
-    edits_to_cigar
+    LazyCigar
 )
 
 ApproxSearchFunc = Callable[
     # p + dist
     [str, int],
     # pos + CIGAR
-    Iterator[tuple[int, str]]
+    Iterator[tuple[int, LazyCigar]]
+]
+ApproxBatchSearchFunc = Callable[
+    # patterns + dist
+    [list[str], int],
+    # pattern index + pos + CIGAR
+    Iterator[tuple[int, int, LazyCigar]]
 ]
 
+# The C- and O-tables hold counts bounded by the length of the bwt
+# string, so we store them in the smallest unsigned type that fits.
+CountTable = npt.NDArray[np.unsignedinteger[Any]]
+SuffixArray = npt.NDArray[np.int32]
+
+
+def _otab_dtype(n: int) -> type[np.unsignedinteger[Any]]:
+    """Pick the smallest dtype that can hold counts up to n."""
+    return np.uint16 if n < 2**16 - 1 else np.uint32
+
 
 def burrows_wheeler_transform(x: str) -> \
-        tuple[bytearray, Alphabet, array]:
+        tuple[bytes, Alphabet, npt.NDArray[np.int64]]:
     """
     Construct the Burrows-Wheeler transform.
 
@@ -37,12 +68,22 @@ def burrows_wheeler_transform(x: str) -> \
     and the suffix array over x.
     """
     x_, alpha = Alphabet.mapped_string_with_sentinel(x)
-    sa = sais_alphabet(x_, alpha)
-    bwt = bytearray(x_[j - 1] for j in sa)
+    bwt, sa = _bwt_from_mapped(x_, alpha)
     return bwt, alpha, sa
 
 
-def build_ctab(bwt: bytearray, asize: int) -> npt.NDArray[np.int32]:
+def _bwt_from_mapped(x_: bytearray, alpha: Alphabet) -> \
+        tuple[bytes, npt.NDArray[np.int64]]:
+    """Construct the bwt string and suffix array of an already mapped x_."""
+    sa = sais_alphabet(x_, alpha)
+    # A single gather; sa[j] - 1 is -1 for the sentinel suffix, which
+    # wraps around to the sentinel at the end of x_, as it should.
+    x_np = np.frombuffer(x_, dtype=np.uint8)
+    bwt = x_np[sa - 1].tobytes()
+    return bwt, sa
+
+
+def build_ctab(bwt: bytes | bytearray, asize: int) -> CountTable:
     """
     Construct a C-table.
 
@@ -54,14 +95,14 @@ def build_ctab(bwt: bytearray, asize: int) -> npt.NDArray[np.int32]:
     since they have the same letters).
     """
     # Count occurrences of characters in bwt
-    counts = Counter(bwt)
-    tab = np.zeros(asize, dtype=np.int32)
-    for a in range(1, asize):
-        tab[a] = counts[a-1] + tab[a-1]
+    counts = np.bincount(np.frombuffer(bwt, dtype=np.uint8),
+                         minlength=asize)
+    tab = np.zeros(asize, dtype=_otab_dtype(len(bwt)))
+    np.cumsum(counts[:-1], out=tab[1:])
     return tab
 
 
-def build_otab(bwt: bytearray, asize: int) -> npt.NDArray[np.int32]:
+def build_otab(bwt: bytes | bytearray, asize: int) -> CountTable:
     """
     Create O-table.
 
@@ -71,106 +112,257 @@ def build_otab(bwt: bytearray, asize: int) -> npt.NDArray[np.int32]:
     nrow = asize
     ncol = len(bwt) + 1
 
-    tbl = np.zeros((nrow, ncol), dtype=np.int32)
-    char_add = np.eye(nrow, nrow, dtype=np.int32)
+    tbl = np.zeros((nrow, ncol), dtype=_otab_dtype(len(bwt)))
 
-    for i in range(1, ncol):
-        tbl[:, i] = tbl[:, i-1] + char_add[:, bwt[i-1]]
+    # Each row is the running count of one letter, so we build the
+    # table a row at a time; each row is a single contiguous cumsum
+    # over the positions where the bwt string has that letter.
+    # Column zero is the empty prefix, so it stays zero.
+    bwt_np = np.frombuffer(bwt, dtype=np.uint8)
+    for a in range(nrow):
+        np.cumsum(bwt_np == a, dtype=tbl.dtype, out=tbl[a, 1:])
 
     return tbl
 
 
+# Edit operations are recorded as their byte values, so we can keep
+# them in a bytearray (or a NumPy uint8 array in the compiled search)
+_MATCH_OP = Edit.MATCH.value
+_INSERT_OP = Edit.INSERT.value
+_DELETE_OP = Edit.DELETE.value
+
+
+class SampledSuffixArray(NamedTuple):
+    """
+    Suffix array that only keeps entries for every k'th text position.
+
+    Row j is sampled if sa[j] % k == 0. For any other row we follow
+    the LF-mapping, LF(j) = cotab(bwt[j], j), which takes us to the row
+    of the suffix that starts one position earlier in the text, until
+    we reach a sampled row. Then sa[j] is the sampled value plus the
+    number of steps, and we never need more than k - 1 steps.
+    """
+
+    bwt: npt.NDArray[np.uint8]
+    sampled: RankBitmap
+    values: SuffixArray
+
+
+def sample_suffix_array(sa: npt.NDArray[np.int64], bwt: bytes,
+                        k: int) -> SampledSuffixArray:
+    """Keep the suffix array entries for every k'th text position."""
+    sa_np = sa.astype(np.int32)
+    sampled = sa_np % k == 0
+    return SampledSuffixArray(
+        np.frombuffer(bwt, dtype=np.uint8),
+        build_rank_bitmap(sampled),
+        sa_np[sampled]
+    )
+
+
+@njit(cache=True)
+def _resolve_sa(
+    j: int,
+    bwt: npt.NDArray[np.uint8],
+    words: npt.NDArray[np.uint64],
+    ranks: npt.NDArray[np.int64],
+    values: SuffixArray,
+    co_words: npt.NDArray[np.uint64],
+    co_ranks: CountTable
+) -> int:
+    """Get sa[j] by LF-stepping to a sampled row."""
+    steps = 0
+    while not is_set(words, j):
+        j = rank_row(co_words, co_ranks, bwt[j], j)
+        steps += 1
+    return int(values[rank(words, ranks, j)]) + steps
+
+
+@njit(cache=True)
+def _resolve_interval(
+    left: int, right: int,
+    bwt: npt.NDArray[np.uint8],
+    words: npt.NDArray[np.uint64],
+    ranks: npt.NDArray[np.int64],
+    values: SuffixArray,
+    co_words: npt.NDArray[np.uint64],
+    co_ranks: CountTable
+) -> npt.NDArray[np.int64]:
+    """Get sa[left:right] by LF-stepping to sampled rows."""
+    res = np.empty(right - left, dtype=np.int64)
+    for j in range(left, right):
+        res[j - left] = _resolve_sa(j, bwt, words, ranks, values,
+                                    co_words, co_ranks)
+    return res
+
+
+def sa_lookup(sa: SampledSuffixArray, cotab: RankTable, j: int) -> int:
+    """Get the suffix array entry sa[j] from a sampled suffix array."""
+    return _resolve_sa(j, sa.bwt, *sa.sampled, sa.values, *cotab)
+
+
+def sa_interval(sa: SampledSuffixArray, cotab: RankTable,
+                left: int, right: int) -> list[int]:
+    """Get the suffix array entries sa[left:right] from a sampled array."""
+    return _resolve_interval(left, right,
+                             sa.bwt, *sa.sampled, sa.values,
+                             *cotab).tolist()
+
+
 class FMIndexTables(NamedTuple):
     """Preprocessed FMIndex tables."""
 
     alpha: Alphabet
-    sa: array
-    ctab: npt.NDArray[np.int32]
-    otab: npt.NDArray[np.int32]
-    rotab: npt.NDArray[np.int32]
-    dtab: list[int]
-    edit_ops: list[Edit]
+    sa: SampledSuffixArray
+    cotab: RankTable
+    crotab: RankTable
+    dtab: list[int] | CountTable
+    edit_ops: bytearray
     p: bytearray
 
 
-def preprocess_tables(x: str) -> \
-    tuple[Alphabet, array,
-          npt.NDArray[np.int32],
-          npt.NDArray[np.int32], npt.NDArray[np.int32]]:
-    """Preprocess tables for exact FM/bwt search."""
-    bwt, alpha, sa = burrows_wheeler_transform(x)
-    ctab = build_ctab(bwt, len(alpha))
-    otab = build_otab(bwt, len(alpha))
-    bwt, alpha, _ = burrows_wheeler_transform(x[::-1])
-    rotab = build_otab(bwt, len(alpha))
-    return alpha, sa, ctab, otab, rotab
+# The preprocessed tables: the alphabet, the sampled suffix array and
+# the fused O-table for x and its reversal.
+FMTables = tuple[Alphabet, SampledSuffixArray, RankTable, RankTable]
 
 
-def build_dtab(
-    p: bytearray,
-    sa: array,
-    ctab: npt.NDArray[np.int32],
-    rotab: npt.NDArray[np.int32]
-) -> list[int]:
-    """Build the D table for the approximative search."""
-    dtab = [0] * (len(p) + 1)  # one extra so we have a zero at -1
+def preprocess_tables(x: str, sample_rate: int = 32) -> FMTables:
+    """
+    Preprocess tables for exact FM/bwt search.
+
+    The search only ever uses the C-table to offset the O-table,
+    ctab[a] + otab[a, i], so we add them once here and return the
+    fused tables cotab and crotab (for the reversed string) instead.
+
+    The fused tables are stored as rank tables (see rank.py): a bit
+    vector per letter plus a checkpoint every 64 positions, rather than
+    a full count per letter and position. That is roughly an eighth of
+    a byte per letter and position plus the checkpoints, instead of
+    two or four bytes, and a lookup costs a popcount.
+
+    The suffix array only keeps every sample_rate'th entry (see
+    SampledSuffixArray), trading memory for the time it takes to
+    recover the rest when reporting hits.
+    """
+    x_, alpha = Alphabet.mapped_string_with_sentinel(x)
+    bwt, sa = _bwt_from_mapped(x_, alpha)
+    ctab = build_ctab(bwt, len(alpha))
+    cotab = build_rank_table(np.frombuffer(bwt, dtype=np.uint8),
+                             len(alpha), ctab)
+    # Reverse the mapped string, but keep the sentinel at the end
+    rbwt, _ = _bwt_from_mapped(x_[-2::-1] + bytes([0]), alpha)
+    crotab = build_rank_table(np.frombuffer(rbwt, dtype=np.uint8),
+                              len(alpha), ctab)
+    return alpha, sample_suffix_array(sa, bwt, sample_rate), cotab, crotab
+
+
+@njit(cache=True)
+def _dtab_kernel(
+    p: npt.NDArray[np.uint8],
+    n: int,
+    cro_words: npt.NDArray[np.uint64],
+    cro_ranks: CountTable,
+    dtab: CountTable
+) -> None:
+    """Compute the D table for p against a text of length n into dtab."""
     min_edits = 0
-    left, right = 0, len(sa)
-    for i, a in enumerate(p):
-        left = int(ctab[a]) + int(rotab[a, left])
-        right = int(ctab[a]) + int(rotab[a, right])
+    left, right = 0, n
+    for i in range(len(p)):
+        a = p[i]
+        left = rank_row(cro_words, cro_ranks, a, left)
+        right = rank_row(cro_words, cro_ranks, a, right)
         if left == right:
             min_edits += 1
-            left, right = 0, len(sa)
+            left, right = 0, n
         dtab[i] = min_edits
+
+
+def build_dtab(
+    p: bytearray,
+    n: int,
+    crotab: RankTable
+) -> CountTable:
+    """
+    Build the D table for the approximative search in a text of length n.
+
+    The entries are bounded by len(p), so like the C- and O-tables
+    we store them in the smallest unsigned type that fits.
+    """
+    # one extra entry so we have a zero at -1
+    dtab = np.zeros(len(p) + 1, dtype=_otab_dtype(len(p)))
+    _dtab_kernel(np.frombuffer(p, dtype=np.uint8), n, *crotab, dtab)
     return dtab
 
 
+@njit(cache=True)
+def _expand(
+    co_words: npt.NDArray[np.uint64],
+    co_ranks: CountTable,
+    left: int, right: int
+) -> list[tuple[int, int, int]]:
+    """
+    Extend the interval [left, right) by every letter.
+
+    Returns the (letter, next_left, next_right) triples for the
+    letters that give a non-empty interval, so the generators get all
+    the rank lookups for a node done in a single (compiled) call.
+
+    Only the recursive generators (use_jit=False) use this; with numba,
+    the search runs in _search_kernel, which does the same lookups in
+    its own letter loops.
+    """
+    out = []
+    for a in range(1, co_words.shape[0]):
+        next_left = rank_row(co_words, co_ranks, a, left)
+        next_right = rank_row(co_words, co_ranks, a, right)
+        if next_left < next_right:
+            out.append((a, next_left, next_right))
+    return out
+
+
 def do_m(tbls: FMIndexTables,
          i: int, left: int, right: int,
-         edits: int) -> Iterator[tuple[int, str]]:
+         edits: int) -> Iterator[tuple[int, LazyCigar]]:
     """Perform a match/mismatch operation in the approx search."""
-    tbls.edit_ops.append(Edit.MATCH)
-    for a in range(1, len(tbls.alpha)):
-        next_left = tbls.ctab[a] + tbls.otab[a, left]
-        next_right = tbls.ctab[a] + tbls.otab[a, right]
-        if next_left >= next_right:
-            continue
-
-        next_edits = edits - (a != tbls.p[i])
-        if next_edits >= tbls.dtab[i-1]:
+    tbls.edit_ops.append(_MATCH_OP)
+    if edits - 1 < tbls.dtab[i-1]:
+        # We can't afford a mismatch, so only the matching letter
+        # can get us anywhere; don't look up the others.
+        a = tbls.p[i]
+        next_left = rank_row(*tbls.cotab, a, left)
+        next_right = rank_row(*tbls.cotab, a, right)
+        if next_left < next_right:
+            yield from rec_search(tbls, i - 1, next_left, next_right, edits)
+    else:
+        for a, next_left, next_right in _expand(*tbls.cotab, left, right):
             yield from rec_search(tbls, i - 1,
                                   next_left, next_right,
-                                  next_edits)
+                                  edits - (a != tbls.p[i]))
     tbls.edit_ops.pop()
 
 
 def do_i(tbls: FMIndexTables,
          i: int, left: int, right: int,
-         edits: int) -> Iterator[tuple[int, str]]:
+         edits: int) -> Iterator[tuple[int, LazyCigar]]:
     """Perform an insertion operation in the approx search."""
     edits -= 1
     i -= 1
     if edits >= tbls.dtab[i]:
-        tbls.edit_ops.append(Edit.INSERT)
+        tbls.edit_ops.append(_INSERT_OP)
         yield from rec_search(tbls, i, left, right, edits)
         tbls.edit_ops.pop()
 
 
 def do_d(tbls: FMIndexTables,
          i: int, left: int, right: int,
-         edits: int) -> Iterator[tuple[int, str]]:
+         edits: int) -> Iterator[tuple[int, LazyCigar]]:
     """Perform a deletion operation in the approx search."""
     if edits - 1 < tbls.dtab[i]:
         # We can't do deletions if we don't have enough edits...
         return
 
-    tbls.edit_ops.append(Edit.DELETE)
-    for a in range(1, len(tbls.alpha)):
-        next_left = tbls.ctab[a] + tbls.otab[a, left]
-        next_right = tbls.ctab[a] + tbls.otab[a, right]
-        if next_left >= next_right:
-            continue
+    tbls.edit_ops.append(_DELETE_OP)
+    for _, next_left, next_right in _expand(*tbls.cotab, left, right):
         yield from rec_search(tbls, i, next_left, next_right, edits - 1)
     tbls.edit_ops.pop()
 
@@ -178,17 +370,17 @@ def do_d(tbls: FMIndexTables,
 def rec_search(tbls: FMIndexTables,
                i: int, left: int, right: int,
                edits: int) \
-        -> Iterator[tuple[int, str]]:
+        -> Iterator[tuple[int, LazyCigar]]:
     """Handle recursive operations in approx search."""
     # Do we have a match here?
     if edits < tbls.dtab[i]:
         return  # Not possible to get anywhere with this...
     if i < 0:
-        # Remember to reverse the operations, since
-        # we did the backwards in the bwt search
-        cigar = edits_to_cigar(tbls.edit_ops[::-1])
-        for j in range(left, right):
-            yield tbls.sa[j], cigar
+        # The cigar reverses the operations (when we need it),
+        # since we did them backwards in the bwt search
+        cigar = LazyCigar(bytes(tbls.edit_ops))
+        for pos in sa_interval(tbls.sa, tbls.cotab, left, right):
+            yield pos, cigar
         return
 
     yield from do_m(tbls, i, left, right, edits)
@@ -196,41 +388,358 @@ def rec_search(tbls: FMIndexTables,
     yield from do_d(tbls, i, left, right, edits)
 
 
+# The states a frame on the explicit stack of the compiled search can
+# be in; they correspond to the steps rec_search takes, with the
+# loops over the alphabet in do_m and do_d split into their own state
+# so we can resume them when we return to the frame.
+_ENTER, _MATCH_LOOP, _INSERT, _DELETE, _DELETE_LOOP = range(5)
+# Frame columns: pattern index, interval, edits left, state, next letter
+_I, _LEFT, _RIGHT, _EDITS, _STATE, _A = range(6)
+
+
+@njit(cache=True)
+def _grow(buf: npt.NDArray[Any]) -> npt.NDArray[Any]:
+    """Copy buf into a buffer with twice as many rows."""
+    res = np.empty((2 * len(buf),) + buf.shape[1:], dtype=buf.dtype)
+    res[:len(buf)] = buf
+    return res
+
+
+@njit(cache=True)
+def _search_kernel(
+    p: npt.NDArray[np.uint8],
+    n: int,
+    co_words: npt.NDArray[np.uint64],
+    co_ranks: CountTable,
+    dtab: CountTable,
+    max_edits: int
+) -> tuple[npt.NDArray[np.int64], npt.NDArray[np.uint8],
+           npt.NDArray[np.int64], int]:
+    """
+    Run the approximative search without recursion.
+
+    This is rec_search/do_m/do_i/do_d unrolled onto an explicit stack,
+    so numba can compile it. It explores the same search tree in the
+    same order, but instead of yielding hits it collects the suffix
+    array interval of each hit in hits, and the edit operations (in the
+    order we did them, i.e., reversed) in hit_ops/hit_nops.
+
+    Returns hits, hit_ops, hit_nops and the number of hits. The buffers
+    grow by doubling when they fill up, so they can be longer than the
+    number of hits.
+    """
+    m = len(p)
+    sigma = len(co_ranks)
+    # dtab[m] is zero and serves as dtab[-1]
+    stack = np.empty((m + max_edits + 2, 6), dtype=np.int64)
+    ops = np.empty(m + max_edits + 1, dtype=np.uint8)
+    hits = np.empty((64, 2), dtype=np.int64)
+    hit_ops = np.empty((64, m + max_edits), dtype=np.uint8)
+    hit_nops = np.empty(64, dtype=np.int64)
+    nhits = 0
+
+    # The first frame is handled by the caller's checks, and we never
+    # do deletions at the end of the pattern, so it starts with the
+    # match operations and skips the deletions after the insertion.
+    sp = 0
+    stack[0, _I] = m - 1
+    stack[0, _LEFT] = 0
+    stack[0, _RIGHT] = n
+    stack[0, _EDITS] = max_edits
+    stack[0, _STATE] = _MATCH_LOOP
+    stack[0, _A] = 1
+    ops[0] = _MATCH_OP
+
+    while sp >= 0:
+        i = stack[sp, _I]
+        left = stack[sp, _LEFT]
+        right = stack[sp, _RIGHT]
+        edits = stack[sp, _EDITS]
+        state = stack[sp, _STATE]
+
+        if state == _ENTER:
+            if edits < dtab[i]:
+                sp -= 1
+            elif i < 0:
+                if nhits == len(hits):
+                    hits = _grow(hits)
+                    hit_ops = _grow(hit_ops)
+                    hit_nops = _grow(hit_nops)
+                hits[nhits, 0] = left
+                hits[nhits, 1] = right
+                for k in range(sp):
+                    hit_ops[nhits, k] = ops[k]
+                hit_nops[nhits] = sp
+                nhits += 1
+                sp -= 1
+            else:
+                stack[sp, _STATE] = _MATCH_LOOP
+                stack[sp, _A] = 1
+                ops[sp] = _MATCH_OP
+
+        elif state == _MATCH_LOOP:
+            a = stack[sp, _A]
+            if a == sigma:
+                stack[sp, _STATE] = _INSERT
+                continue
+            stack[sp, _A] = a + 1
+            next_edits = edits - (a != p[i])
+            if next_edits < dtab[i - 1]:
+                # a mismatch we can't afford; skip the rank lookups
+                continue
+            next_left = rank_row(co_words, co_ranks, a, left)
+            next_right = rank_row(co_words, co_ranks, a, right)
+            if next_left >= next_right:
+                continue
+            sp += 1
+            stack[sp, _I] = i - 1
+            stack[sp, _LEFT] = next_left
+            stack[sp, _RIGHT] = next_right
+            stack[sp, _EDITS] = next_edits
+            stack[sp, _STATE] = _ENTER
+
+        elif state == _INSERT:
+            stack[sp, _STATE] = _DELETE
+            if edits - 1 >= dtab[i - 1]:
+                ops[sp] = _INSERT_OP
+                sp += 1
+                stack[sp, _I] = i - 1
+                stack[sp, _LEFT] = left
+                stack[sp, _RIGHT] = right
+                stack[sp, _EDITS] = edits - 1
+                stack[sp, _STATE] = _ENTER
+
+        elif state == _DELETE:
+            if sp == 0 or edits - 1 < dtab[i]:
+                sp -= 1
+            else:
+                stack[sp, _STATE] = _DELETE_LOOP
+                stack[sp, _A] = 1
+                ops[sp] = _DELETE_OP
+
+        else:  # _DELETE_LOOP
+            a = stack[sp, _A]
+            if a == sigma:
+                sp -= 1
+                continue
+            stack[sp, _A] = a + 1
+            next_left = rank_row(co_words, co_ranks, a, left)
+            next_right = rank_row(co_words, co_ranks, a, right)
+            if next_left >= next_right:
+                continue
+            sp += 1
+            stack[sp, _I] = i
+            stack[sp, _LEFT] = next_left
+            stack[sp, _RIGHT] = next_right
+            stack[sp, _EDITS] = edits - 1
+            stack[sp, _STATE] = _ENTER
+
+    return hits, hit_ops, hit_nops, nhits
+
+
+def jit_search(tbls: FMIndexTables, edits: int) \
+        -> Iterator[tuple[int, LazyCigar]]:
+    """Run the approximative search through the compiled kernel."""
+    p = np.frombuffer(tbls.p, dtype=np.uint8)
+    hits, hit_ops, hit_nops, nhits = _search_kernel(
+        p, len(tbls.sa.bwt), *tbls.cotab, np.asarray(tbls.dtab), edits
+    )
+
+    for h in range(nhits):
+        cigar = LazyCigar(hit_ops[h, :hit_nops[h]].tobytes())
+        for pos in sa_interval(tbls.sa, tbls.cotab, hits[h, 0], hits[h, 1]):
+            yield pos, cigar
+
+
+def _warm_up(sa: SampledSuffixArray,
+             cotab: RankTable,
+             crotab: RankTable) -> None:
+    """
+    Run the compiled kernels once on the tables' types.
+
+    We pay for compiling the kernels (or loading them from numba's
+    cache) now, rather than on the first real search. We search in an
+    empty text, n = 0, so the kernels only look at the first word of
+    each table and the cost doesn't depend on the size of the tables.
+    """
+    p = np.ones(1, dtype=np.uint8)
+    dtab = np.zeros(len(p) + 1, dtype=_otab_dtype(len(p)))
+    _dtab_kernel(p, 0, *crotab, dtab)
+    _search_kernel(p, 0, *cotab, dtab, 1)
+    _resolve_interval(0, 0, sa.bwt, *sa.sampled, sa.values, *cotab)
+
+
 def approx_searcher_from_tables(
         alpha: Alphabet,
-        sa: array,
-        ctab: npt.NDArray[np.int32],
-        otab: npt.NDArray[np.int32],
-        rotab: npt.NDArray[np.int32]
+        sa: SampledSuffixArray,
+        cotab: RankTable,
+        crotab: RankTable,
+        use_jit: bool = HAVE_NUMBA
 ) -> ApproxSearchFunc:
-    """Build an exact search function from preprocessed tables."""
+    """
+    Build an exact search function from preprocessed tables.
+
+    If use_jit is true, the search runs in the compiled kernel,
+    otherwise it runs as the recursive Python generators.
+    """
     # @profile
-    def search(p_: str, edits: int) -> Iterator[tuple[int, str]]:
+    def search(p_: str, edits: int) -> Iterator[tuple[int, LazyCigar]]:
         assert p_, "We can't do approx search with an empty pattern!"
         try:
             p = alpha.map(p_)
         except KeyError:
             return  # can't map, so no matches
 
-        dtab = build_dtab(p, sa, ctab, rotab)
+        dtab = build_dtab(p, len(sa.bwt), crotab)
         if dtab[len(p)-1] > edits:
             # If it takes more edits than we have,
             # we might as well bail now...
             return
 
+        if use_jit:
+            yield from jit_search(FMIndexTables(alpha, sa,
+                                                cotab, crotab, dtab,
+                                                bytearray(), p),
+                                  edits)
+            return
+
+        # The generators index the D table a lot, and indexing a list
+        # is faster than indexing an array from Python
         tbls = FMIndexTables(alpha, sa,
-                             ctab, otab, rotab, dtab,
-                             list[Edit](), p)
+                             cotab, crotab, dtab.tolist(),
+                             bytearray(), p)
 
         # Do the first operation in this function to avoid
         # deletions in the beginning (end) of the search
-        left, right, i = 0, len(sa), len(p) - 1
+        left, right, i = 0, len(sa.bwt), len(p) - 1
         yield from do_m(tbls, i, left, right, edits)
         yield from do_i(tbls, i, left, right, edits)
 
+    if use_jit and len(alpha) > 1:
+        _warm_up(sa, cotab, crotab)
+
     return search
 
 
-def approx_preprocess(x: str) -> ApproxSearchFunc:
-    """Build an approximative search function for searching in string x."""
-    return approx_searcher_from_tables(*preprocess_tables(x))
+def approx_batch_searcher_from_tables(
+        alpha: Alphabet,
+        sa: SampledSuffixArray,
+        cotab: RankTable,
+        crotab: RankTable,
+        use_jit: bool = HAVE_NUMBA
+) -> ApproxBatchSearchFunc:
+    """
+    Build a search function for a batch of patterns from preprocessed tables.
+
+    The search function takes a list of patterns and yields
+    (pattern index, pos, CIGAR) for all hits, in the order the
+    patterns have in the list, and it yields each pattern's hits as
+    soon as they are found.
+
+    Identical patterns (not unusual in a set of reads) are only
+    searched once; we keep the hits of a pattern around only while it
+    still has copies later in the batch. We can't share more than that
+    between patterns, since the D-table pruning depends on the entire
+    pattern.
+    """
+    search = approx_searcher_from_tables(alpha, sa, cotab, crotab, use_jit)
+
+    def search_many(patterns: list[str], edits: int) \
+            -> Iterator[tuple[int, int, LazyCigar]]:
+        remaining = Counter(patterns)
+        seen: dict[str, list[tuple[int, LazyCigar]]] = {}
+        for idx, p in enumerate(patterns):
+            remaining[p] -= 1
+            hits: Iterable[tuple[int, LazyCigar]]
+            if p in seen:
+                hits = seen[p] if remaining[p] else seen.pop(p)
+            elif remaining[p]:
+                hits = seen[p] = list(search(p, edits))
+            else:
+                hits = search(p, edits)
+            for pos, cigar in hits:
+                yield idx, pos, cigar
+
+    return search_many
+
+
+def save_tables(path: str, tables: FMTables) -> None:
+    """
+    Save preprocessed tables in the directory path.
+
+    Each array goes in its own .npy file, so load_tables can memory
+    map them. The alphabet is saved as the code points of its letters.
+
+    The files are written to a temporary directory next to path, which
+    is only renamed to path once they are all there, so an interrupted
+    save never leaves a directory with missing tables behind. Saving to
+    a path that is already a non-empty directory raises an OSError.
+    """
+    alpha, sa, cotab, crotab = tables
+    arrays: dict[str, npt.NDArray[Any]] = {
+        "alpha": np.array([ord(a) for a in alpha.revmap(range(1, len(alpha)))],
+                          dtype=np.uint32),
+        "bwt": sa.bwt,
+        "sampled_words": sa.sampled.words,
+        "sampled_ranks": sa.sampled.ranks,
+        "sa_values": sa.values,
+        "cotab_words": cotab.words,
+        "cotab_ranks": cotab.ranks,
+        "crotab_words": crotab.words,
+        "crotab_ranks": crotab.ranks,
+    }
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), arr)
+        os.replace(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_tables(path: str) -> FMTables:
+    """
+    Load tables saved with save_tables from the directory path.
+
+    The arrays are memory mapped read-only, so the operating system
+    pages them in as the search needs them rather than us reading
+    them all up front.
+    """
+    def load(name: str) -> npt.NDArray[Any]:
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode='r')
+
+    alpha = Alphabet(''.join(chr(a) for a in load("alpha")))
+    sa = SampledSuffixArray(
+        load("bwt"),
+        RankBitmap(load("sampled_words"), load("sampled_ranks")),
+        load("sa_values")
+    )
+    cotab = RankTable(load("cotab_words"), load("cotab_ranks"))
+    crotab = RankTable(load("crotab_words"), load("crotab_ranks"))
+    return alpha, sa, cotab, crotab
+
+
+def approx_preprocess(x: str, cache_dir: str | None = None) \
+        -> ApproxSearchFunc:
+    """
+    Build an approximative search function for searching in string x.
+
+    If cache_dir is given, the tables are saved there, under a hash of
+    x, and loaded from there if we have preprocessed x before.
+    """
+    if cache_dir is None:
+        return approx_searcher_from_tables(*preprocess_tables(x))
+
+    key = hashlib.blake2b(x.encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, key)
+    if not os.path.isdir(path):
+        try:
+            save_tables(path, preprocess_tables(x))
+        except OSError:
+            # Someone else saved the same tables while we built ours
+            if not os.path.isdir(path):
+                raise
+    return approx_searcher_from_tables(*load_tables(path))
@@ -1,10 +1,18 @@
 """Test bwt."""
 
+import os
+import tempfile
 import numpy as np
-from test_helpers import check_matches
+from sais import sais
+from test_helpers import (
+    check_matches,
+    pick_random_patterns_len,
+    random_string
+)
 import alphabet
 import approx
 import bwt
+import rank
 
 
 def test_ctable() -> None:
@@ -21,7 +29,7 @@ def test_otable() -> None:
     """Test O-table."""
     x = "aabca"
     transformed, alpha, _ = bwt.burrows_wheeler_transform(x)
-    assert transformed == bytearray([1, 3, 0, 1, 1, 2])
+    assert transformed == bytes([1, 3, 0, 1, 1, 2])
 
     # we shouldn't look at private members, of course, but
     # we are only testing...
@@ -52,3 +60,79 @@ def test_mississippi_aprox_edit() -> None:
             for pos, cigar in search(p, edits):
                 align = approx.extract_alignment(x, p, pos, cigar)
                 assert approx.count_edits(align) <= edits
+
+
+def test_jit_search_agrees() -> None:
+    """Test that the compiled search finds what the recursive one does."""
+    for _ in range(10):
+        x = random_string(200, alpha="acgt")
+        tbls = bwt.preprocess_tables(x)
+        rec = bwt.approx_searcher_from_tables(*tbls, use_jit=False)
+        jit = bwt.approx_searcher_from_tables(*tbls, use_jit=True)
+        for p in pick_random_patterns_len(x, 5, 10):
+            for edits in [0, 1, 2]:
+                assert list(rec(p, edits)) == list(jit(p, edits))
+
+    # A repetitive string gives us more hits than fit in the
+    # kernel's initial buffers
+    tbls = bwt.preprocess_tables("acgt" * 100)
+    rec = bwt.approx_searcher_from_tables(*tbls, use_jit=False)
+    jit = bwt.approx_searcher_from_tables(*tbls, use_jit=True)
+    assert list(rec("acgt" * 6, 3)) == list(jit("acgt" * 6, 3))
+
+
+def test_batch_search() -> None:
+    """Test that the batch search finds what searching one at a time does."""
+    x = random_string(500, alpha="acgt")
+    tbls = bwt.preprocess_tables(x)
+    search = bwt.approx_searcher_from_tables(*tbls)
+    search_many = bwt.approx_batch_searcher_from_tables(*tbls)
+    patterns = list(pick_random_patterns_len(x, 20, 10))
+    patterns += patterns[:5] + ["acgn"]  # duplicates and no matches
+    for edits in [0, 1, 2]:
+        expected = [
+            (idx, pos, cigar)
+            for idx, p in enumerate(patterns)
+            for pos, cigar in search(p, edits)
+        ]
+        assert list(search_many(patterns, edits)) == expected
+
+
+def test_sampled_suffix_array() -> None:
+    """Test that we recover the full suffix array from the sampled one."""
+    for x in ["mississippi", random_string(300, alpha="acgt")]:
+        sa = list(sais(x))
+        for k in [1, 2, 5, 32, 1000]:
+            _, ssa, cotab, _ = bwt.preprocess_tables(x, sample_rate=k)
+            assert [bwt.sa_lookup(ssa, cotab, j)
+                    for j in range(len(sa))] == sa
+            assert bwt.sa_interval(ssa, cotab, 0, len(sa)) == sa
+
+
+def test_rank_table() -> None:
+    """Test that the packed O-table gives the same counts as the full one."""
+    x = random_string(300, alpha="acgt")
+    transformed, alpha, _ = bwt.burrows_wheeler_transform(x)
+    ctab = bwt.build_ctab(transformed, len(alpha))
+    cotab = bwt.build_otab(transformed, len(alpha)) + ctab[:, None]
+    packed = rank.build_rank_table(
+        np.frombuffer(transformed, dtype=np.uint8), len(alpha), ctab
+    )
+    for a in range(len(alpha)):
+        for i in range(len(transformed) + 1):
+            assert rank.rank_row(*packed, a, i) == cotab[a, i]
+
+
+def test_save_and_load_tables() -> None:
+    """Test that searching in saved and loaded tables finds the same."""
+    x = random_string(300, alpha="acgt")
+    search = bwt.approx_preprocess(x)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # first call builds and saves the tables, the second loads them
+        for _ in range(2):
+            cached = bwt.approx_preprocess(x, cache_dir=cache_dir)
+            for p in pick_random_patterns_len(x, 5, 10):
+                assert list(search(p, 1)) == list(cached(p, 1))
+            # the tables were moved into place, with no leftovers
+            assert len(os.listdir(cache_dir)) == 1
+
@@ -0,0 +1,35 @@
+"""
+Optional just-in-time compilation with numba.
+
+The hottest loops are written so numba can compile them to native
+code, but we don't want numba to be a hard requirement, so if it
+isn't installed the decorated functions are left as plain Python
+(correct, just slow) and HAVE_NUMBA tells callers to prefer the
+pure Python algorithms instead.
+"""
+
+from typing import (
+    Any,
+    Callable,
+    TypeVar
+)
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+try:
+    import numba
+    from numba import prange
+    HAVE_NUMBA = True
+except ImportError:  # pragma: no cover
+    numba = None  # type: ignore[assignment]
+    prange = range  # type: ignore[misc]  # just loops without numba
+    HAVE_NUMBA = False
+
+
+def njit(**options: Any) -> Callable[[F], F]:
+    """Compile a function with numba.njit(**options) if we have numba."""
+    def wrap(f: F) -> F:
+        if numba is None:  # pragma: no cover
+            return f
+        return numba.njit(**options)(f)
+    return wrap
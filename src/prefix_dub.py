@@ -341,106 +341,178 @@ i-component in order. Within each i-block, we need to sort the j's, but that
 is just one integer, so four bucket-sorts of bytes.
 
 There are different ways of doing this, but they are pretty much all
-highly efficient. I haven't done it in the Python code, though, since
-Python doesn't have fixed-sized integers, and it is slightly more complicated
-(and a bit more ugly) to radix sort Python's kind of integers. If you want
-to see the full solution, check out e.g. the C or Go implementations.
+highly efficient. Here, we keep the ranks in NumPy arrays, so we do have
+fixed-sized integers, and we pack each pair into a single 64-bit key,
+the first rank in the high bits and the second in the low bits. Then
+one stable radix sort of the keys, 16 bits at a time, sorts the pairs,
+and since the ranks never need more bits than the alphabet size does,
+small alphabets need fewer passes (see sort_pairs and stable_order).
 """
 
-from collections import Counter
-from dataclasses import dataclass
-from alphabet import Alphabet
+from typing import Any
+import numpy as np
+import numpy.typing as npt
 
+from jit import HAVE_NUMBA, njit, prange
 
-@dataclass
-class Rank:
-    """Wrapper around a list that handles out-of-bounds indexing."""
+# The suffix array, as indices into x
+SuffixArray = npt.NDArray[np.int64]
+# The ranks of the suffixes, in the order they have in x. The array
+# is twice as long as x, with rank zero for all the indices past the
+# end; we never look more than k < n past a suffix, so we can index
+# rank[i + k] without checking that we are still inside x.
+Rank = npt.NDArray[np.uint32]
 
-    ranks: list[int]
 
-    def __setitem__(self, i: int, val: int) -> None:
-        """Set the rank for a suffix."""
-        self.ranks[i] = val
+# The radix sort sorts keys 16 bits at a time, splitting the input
+# in chunks that are counted and placed in parallel.
+_RADIX_BITS = 16
+_RADIX_MASK = (1 << _RADIX_BITS) - 1
+_CHUNKS = 16
 
-    def __getitem__(self, i: int) -> int:
-        """Get the rank of a suffix."""
-        return self.ranks[i] if i < len(self.ranks) else 0
-
-
-def buckets(keys: list[int]) -> list[int]:
-    """Compute bucket indices for keys."""
-    counts = Counter(keys)
-    buckets = [0] * (max(counts.keys()) + 1)
-    for i, _ in enumerate(buckets):
-        # for i=0 we rely on wrap around and default values
-        buckets[i] = buckets[i-1] + counts[i-1]
-    return buckets
 
+@njit(cache=True, parallel=True)
+def _radix_pass(keys: npt.NDArray[np.unsignedinteger[Any]],
+                order: SuffixArray, shift: int, out: SuffixArray) -> None:
+    """
+    Stable counting sort of order by one digit of keys[order] into out.
 
-def sort_with_rank(sa: list[int], k: int, rank: Rank) -> list[int]:
+    Each chunk of order gets its own histogram, so the chunks can be
+    counted in parallel; the scan over the histograms then tells each
+    chunk where its elements go in every bucket, after the elements
+    in earlier chunks, so the chunks can be placed in parallel too.
     """
-    Return the suffixes in sa, sorted with respect to rank at offset k.
+    n = len(order)
+    size = (n + _CHUNKS - 1) // _CHUNKS
+    # Shift and mask as uint64; mixing it with int64 would give floats
+    ushift, umask = np.uint64(shift), np.uint64(_RADIX_MASK)
+    hist = np.zeros((_CHUNKS, _RADIX_MASK + 1), dtype=np.int64)
+    for t in prange(_CHUNKS):
+        for i in range(t * size, min((t + 1) * size, n)):
+            hist[t, np.int64((keys[order[i]] >> ushift) & umask)] += 1
+
+    total = 0
+    for b in range(_RADIX_MASK + 1):
+        for t in range(_CHUNKS):
+            count = hist[t, b]
+            hist[t, b] = total
+            total += count
+
+    for t in prange(_CHUNKS):
+        for i in range(t * size, min((t + 1) * size, n)):
+            d = np.int64((keys[order[i]] >> ushift) & umask)
+            out[hist[t, d]] = order[i]
+            hist[t, d] += 1
+
+
+def stable_order(keys: npt.NDArray[np.unsignedinteger[Any]]) -> SuffixArray:
+    """
+    Get the permutation that stably sorts keys.
 
-    Returns a new list of indices that are a stable sort of sa according to
-    rank[sa[i]+k].
+    With numba, this is a parallel LSD radix sort with 16-bit digits,
+    with only as many passes as the largest key needs. Without numba,
+    it is NumPy's stable argsort.
     """
-    keys = [rank[i + k] for i in sa]
-    out = [0] * len(sa)
-    buck = buckets(keys)
-    for j, i in enumerate(sa):
-        out[buck[keys[j]]] = i
-        buck[keys[j]] += 1
-    return out
+    if not HAVE_NUMBA:
+        return np.argsort(keys, kind='stable')
+    order = np.arange(len(keys), dtype=np.int64)
+    out = np.empty_like(order)
+    bits = int(keys.max()).bit_length() if len(keys) else 0
+    for shift in range(0, max(bits, 1), _RADIX_BITS):
+        _radix_pass(keys, order, shift, out)
+        order, out = out, order
+    return order
 
 
-def sort_pairs(sa: list[int], k: int, rank: Rank) -> list[int]:
-    """
-    Sort sa as pairs taken from rank[sa[i]] and rank[sa[i]+k].
+# The pairs (rank[sa[i]], rank[sa[i]+k]), in the order of sa, packed
+# into one integer each, so two pairs are equal if their keys are.
+Pairs = npt.NDArray[np.uint64]
 
-    The sort is a stable radix where we first sort with respect
-    to rank[sa[i]+k] and then follow with a sort of rank[sa[i]].
 
-    We return the new sorted array.
+def sort_pairs(sa: SuffixArray, k: int, rank: Rank, asize: int) \
+        -> tuple[SuffixArray, Pairs]:
     """
-    sa = sort_with_rank(sa, k, rank)
-    sa = sort_with_rank(sa, 0, rank)
-    return sa
-
+    Sort sa as pairs taken from rank[sa[i]] and rank[sa[i]+k].
 
-def update_rank(sa: list[int], k: int, rank: Rank) -> tuple[int, Rank]:
+    The ranks are less than asize, so they fit in b = asize.bit_length()
+    bits, and we can pack a pair into a single uint64 key, rank[sa[i]]
+    shifted up by b and rank[sa[i]+k] in the low bits. The keys sort
+    like the pairs, so a single stable radix sort of the keys does the
+    job, with as few passes as the 2b bits need.
+
+    But sa is already sorted with respect to rank[sa[i]], from the
+    previous round, so a suffix that is alone in its rank[sa[i]] group
+    is already where it should be. We only sort the suffixes in groups
+    of two or more, and since the sort is stable, those groups stay in
+    the same place in sa. We sort sa in place.
+
+    We return the sorted array, together with the keys in the new order;
+    we have built them for the sort already, so this saves update_rank
+    from gathering the pairs again. For the suffixes alone in their group,
+    we don't gather the second rank; their first rank differs from their
+    neighbours' anyway, and the low bits are left zero.
+    """
+    first = rank[sa]
+    same = first[1:] == first[:-1]
+    in_group = np.zeros(len(sa), dtype=np.bool_)
+    in_group[1:] |= same
+    in_group[:-1] |= same
+    idx = np.flatnonzero(in_group)
+
+    keys = first.astype(np.uint64) << np.uint64(asize.bit_length())
+    suffixes = sa[idx]
+    group_keys = keys[idx] | rank[suffixes + k]
+    order = stable_order(group_keys)
+    sa[idx] = suffixes[order]
+    keys[idx] = group_keys[order]
+    return sa, keys
+
+
+def update_rank(sa: SuffixArray, pairs: Pairs, rank: Rank) -> int:
     """
     Update the rank according to the new ordering.
 
-    First we extract the pairs (rank[i],rank[i+k]) where we take the indices i
-    in the order they appear in sa. That way, the pairs are sorted (as long as
-    we have sorted up to prefix length k, which we will have done here).
+    The pairs (rank[i],rank[i+k]) are for the indices i in the order they
+    appear in sa. That way, the pairs are sorted (as long as we have sorted
+    up to prefix length k, which we will have done here).
 
     After that, it is a simple matter of running through the pairs and building
-    an alphabet. Notice the indexing (i indices according to the order of pairs
-    while j indices according to sa). This is necessary since the order in sa
-    is the curren sorted order while rank always has the suffixes in the order
-    at which they appear in the string.
+    an alphabet: a pair gets a new letter if it differs from the one before
+    it, so the new letters are the running count of such differences. Notice
+    that we write the letters to the positions in sa. This is necessary since
+    the order in sa is the curren sorted order while rank always has the
+    suffixes in the order at which they appear in the string.
+
+    We have the pairs, so we don't need the old ranks any more, and we
+    write the new ones into rank in place. If all the letters are
+    different, sa is sorted and we are done, so then we don't bother.
+    Returns the number of letters.
     """
-    pairs = [(rank[i], rank[i+k]) for i in sa]
-    pairs.append(pairs[0])  # removes a special case in the loop
-    a, new_rank = 0, [0] * len(pairs)
-    for i, j in enumerate(sa):
-        a += pairs[i - 1] != pairs[i]
-        new_rank[j] = a
-    return a + 1, Rank(new_rank)
+    new_letter = np.zeros(len(sa), dtype=np.uint32)
+    new_letter[1:] = pairs[1:] != pairs[:-1]
+    letters = np.cumsum(new_letter, dtype=np.uint32)
+
+    asize = int(letters[-1]) + 1
+    if asize < len(sa):
+        rank[sa] = letters
+    return asize
 
 
-def prefix_doubling(x: bytearray, asize: int) -> list[int]:
+def prefix_doubling(x: bytearray, asize: int) -> SuffixArray:
     """
     Compute the suffix array for x using a least-significant digit radix sort.
     """
-    rank = Rank(x)
-    sa = sort_with_rank(list(range(len(x))), 0, rank)
+    # The first round sorts on the letters, so we sort the bytes of x
+    # directly, then zero-extend them into the rank array.
+    letters = np.frombuffer(x, dtype=np.uint8)
+    sa = stable_order(letters)
+    rank = np.zeros(2 * len(x), dtype=np.uint32)
+    rank[:len(x)] = letters
 
     k = 1
     while asize < len(sa):
-        sa = sort_pairs(sa, k, rank)
-        asize, rank = update_rank(sa, k, rank)
+        sa, pairs = sort_pairs(sa, k, rank, asize)
+        asize = update_rank(sa, pairs, rank)
         k *= 2
 
     return sa
@@ -0,0 +1,54 @@
+"""Test of the prefix doubling algorithm."""
+
+from test_helpers import (
+    check_sorted,
+    fibonacci_string,
+    random_string
+)
+import numpy as np
+from alphabet import Alphabet
+from prefix_dub import prefix_doubling, stable_order
+from sais import sais
+
+
+def test_mississippi() -> None:
+    """Test on mississippi."""
+    x = "mississippi"
+    x_, alpha = Alphabet.mapped_string_with_sentinel(x)
+    sa = prefix_doubling(x_, len(alpha))
+    assert list(sa) == [11, 10, 7, 4, 1, 0, 9, 8, 6, 3, 5, 2]
+
+
+def test_prefix_doubling_sorted() -> None:
+    """Test that the suffix array is sorted and agrees with sais."""
+    for x in [random_string(1000) for _ in range(10)] + \
+             [random_string(1000, alpha="ab") for _ in range(10)] + \
+             [fibonacci_string(n) for n in range(10, 15)] + \
+             ["a" * 100]:
+        x_, alpha = Alphabet.mapped_string_with_sentinel(x)
+        sa = prefix_doubling(x_, len(alpha))
+        check_sorted(x, sa)
+        assert list(sa) == list(sais(x))
+
+
+def test_prefix_doubling_wide_ranks() -> None:
+    """Test a string long enough that the packed pairs need 3 radix passes."""
+    x = random_string(100_000, alpha="acgt")
+    x_, alpha = Alphabet.mapped_string_with_sentinel(x)
+    assert list(prefix_doubling(x_, len(alpha))) == list(sais(x))
+
+
+def test_stable_order() -> None:
+    """Test that the radix sort is a stable sort, also for wide keys."""
+    for high in (4, 2**16, 2**32 - 1, 2**64 - 1):
+        keys = np.random.randint(0, high, size=10_000, dtype=np.uint64)
+        assert (stable_order(keys) ==
+                np.argsort(keys, kind='stable')).all()
+
+
+if __name__ == '__main__':
+    globs = list(globals().items())
+    for name, f in globs:
+        if name.startswith("test_"):
+            print(name)
+            f()
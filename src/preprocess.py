@@ -1,34 +1,64 @@
 """Code for preprocessing a genome for FM-index search."""
 
-import pickle
+import os
+import shutil
+import tempfile
 from bwt import (
     preprocess_tables,
-    approx_searcher_from_tables,
-    ApproxSearchFunc
+    save_tables,
+    load_tables,
+    approx_batch_searcher_from_tables,
+    ApproxBatchSearchFunc
 )
 
 
 # A genome maps from chromosome names to chromosome sequences
 GENOME = dict[str, str]
 # Once preprocessed and loaded, we have a table of search functions
-# instead.
-GENOME_SEARCH = dict[str, ApproxSearchFunc]
-
-
-def preprocess(genome: GENOME, preproc_file_name: str) -> None:
-    """Preprocess a genome and pickle the generated search functions."""
-    preprocessed = {
-        name: preprocess_tables(seq) for name, seq in genome.items()
-    }
-    with open(preproc_file_name, "wb") as preproc_file:
-        pickle.dump(preprocessed, preproc_file)
-
-
-def load_preprocessed(preproc_file_name: str) -> GENOME_SEARCH:
-    """Load preprocessed tables and make them into search functions."""
-    with open(preproc_file_name, "rb") as preproc_file:
-        preproc_tables = pickle.load(preproc_file)
-    return {
-        name: approx_searcher_from_tables(*tbl)
-        for name, tbl in preproc_tables.items()
-    }
+# instead, each searching for a batch of reads at a time.
+GENOME_SEARCH = dict[str, ApproxBatchSearchFunc]
+
+
+def preprocess(genome: GENOME, preproc_dir_name: str) -> None:
+    """
+    Preprocess a genome and save the tables in a directory.
+
+    The tables for each chromosome go in their own numbered
+    sub-directory, and the file "chromosomes" lists the names of the
+    chromosomes, one per line, in the same order.
+
+    Everything is written to a temporary directory first, which then
+    replaces preproc_dir_name, so an interrupted run leaves the old
+    tables (or none) rather than half of the new ones. Older versions
+    saved the tables as a single pickle file with the same name; if we
+    find one, it is replaced as well.
+    """
+    target = os.path.abspath(preproc_dir_name)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(target), prefix=".tmp-")
+    try:
+        with open(os.path.join(tmp, "chromosomes"), "w",
+                  encoding="utf-8") as names:
+            for i, (name, seq) in enumerate(genome.items()):
+                save_tables(os.path.join(tmp, str(i)),
+                            preprocess_tables(seq))
+                print(name, file=names)
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        os.replace(tmp, target)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_preprocessed(preproc_dir_name: str) -> GENOME_SEARCH:
+    """Load (memory map) preprocessed tables and make them search functions."""
+    with open(os.path.join(preproc_dir_name, "chromosomes"),
+              encoding="utf-8") as names:
+        return {
+            name.rstrip("\n"): approx_batch_searcher_from_tables(
+                *load_tables(os.path.join(preproc_dir_name, str(i)))
+            )
+            for i, name in enumerate(names)
+        }
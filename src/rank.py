@@ -0,0 +1,108 @@
+"""
+Bit vectors with constant time rank queries.
+
+A bit vector is stored as 64-bit words, bit i of the vector being
+bit i % 64 of word i // 64, together with a checkpoint per word
+holding the number of set bits in all the words before it. The rank
+of a position, i.e., the number of set bits before it, is then the
+checkpoint for its word plus a popcount of the bits before it in the
+word.
+"""
+
+from typing import (
+    Any,
+    NamedTuple
+)
+import numpy as np
+import numpy.typing as npt
+from jit import HAVE_NUMBA, njit
+
+WORD_BITS = 64
+
+
+class RankBitmap(NamedTuple):
+    """A bit vector with checkpoints for rank queries."""
+
+    words: npt.NDArray[np.uint64]
+    ranks: npt.NDArray[np.int64]
+
+
+def build_rank_bitmap(bits: npt.NDArray[np.bool_]) -> RankBitmap:
+    """Pack bits into a bit vector we can do rank queries on."""
+    # Pad to whole words, plus one so rank(len(bits)) has a word
+    nwords = len(bits) // WORD_BITS + 1
+    padded = np.zeros(nwords * WORD_BITS, dtype=np.bool_)
+    padded[:len(bits)] = bits
+    words = np.packbits(padded, bitorder='little') \
+        .view('<u8').astype(np.uint64)
+    ranks = np.zeros(nwords, dtype=np.int64)
+    np.cumsum(padded.reshape(nwords, WORD_BITS).sum(axis=1)[:-1],
+              out=ranks[1:])
+    return RankBitmap(words, ranks)
+
+
+# int() of an int64 is still an int64 in numba, but in plain Python it
+# gets us a Python int, which is what the annotations promise.
+if HAVE_NUMBA:
+    @njit(cache=True)
+    def popcount(x: np.uint64) -> int:
+        """Count the set bits in a word with the classic SWAR bit trick."""
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = (x & np.uint64(0x3333333333333333)) + \
+            ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return int(np.int64((x * np.uint64(0x0101010101010101))
+                            >> np.uint64(56)))
+else:  # pragma: no cover
+    def popcount(x: np.uint64) -> int:
+        """Count the set bits in a word."""
+        return int(x).bit_count()
+
+
+@njit(cache=True)
+def is_set(words: npt.NDArray[np.uint64], i: int) -> bool:
+    """Test if bit i is set in the bit vector."""
+    return bool((words[i >> 6] >> np.uint64(i & 63)) & np.uint64(1))
+
+
+@njit(cache=True)
+def rank(words: npt.NDArray[np.uint64], ranks: npt.NDArray[np.int64],
+         i: int) -> int:
+    """Count the set bits before position i in the bit vector."""
+    mask = (np.uint64(1) << np.uint64(i & 63)) - np.uint64(1)
+    return int(np.int64(ranks[i >> 6]) + popcount(words[i >> 6] & mask))
+
+
+class RankTable(NamedTuple):
+    """Bit vectors, one row per letter, with checkpoints for rank queries."""
+
+    words: npt.NDArray[np.uint64]
+    ranks: npt.NDArray[np.unsignedinteger[Any]]
+
+
+def build_rank_table(x: npt.NDArray[np.uint8], asize: int,
+                     offsets: npt.NDArray[np.unsignedinteger[Any]]) \
+        -> RankTable:
+    """
+    Build a rank table for the letters in x.
+
+    Row a has the bit vector for the positions where x has letter a,
+    and its checkpoints are offset by offsets[a], so a rank query in
+    row a at position i gives offsets[a] plus the number of a's in
+    x[:i]. The checkpoints get the dtype of offsets.
+    """
+    rows = [build_rank_bitmap(x == a) for a in range(asize)]
+    words = np.stack([row.words for row in rows])
+    ranks = np.stack([row.ranks for row in rows]).astype(offsets.dtype)
+    ranks += offsets[:, None]
+    return RankTable(words, ranks)
+
+
+@njit(cache=True)
+def rank_row(words: npt.NDArray[np.uint64],
+             ranks: npt.NDArray[np.unsignedinteger[Any]],
+             a: int, i: int) -> int:
+    """Look up the (offset) rank of position i in row a of a rank table."""
+    mask = (np.uint64(1) << np.uint64(i & 63)) - np.uint64(1)
+    return int(np.int64(ranks[a, i >> 6]) +
+               popcount(words[a, i >> 6] & mask))
@@ -2,6 +2,7 @@
 
 
 import argparse
+import itertools
 import sys
 
 from preprocess import (
@@ -10,7 +11,10 @@ from preprocess import (
 )
 from fasta import read_fasta
 from fastq import scan_reads
-from sam import ssam_record
+from sam import ssam_line
+
+# Number of reads we search for at a time
+BATCH_SIZE = 4096
 
 
 def main() -> None:
@@ -47,14 +51,27 @@ def main() -> None:
             argparser.print_help()
             sys.exit(1)
 
-        genome_searchers = load_preprocessed(args.genome.name+".readmap")
-        for read_name, read_seq in scan_reads(args.reads):
-            for chr_name, search in genome_searchers.items():
-                for i, cigar in search(read_seq, args.d):
-                    ssam_record(sys.stdout,
-                                read_name, chr_name,
-                                i, cigar,
-                                read_seq)
+        try:
+            genome_searchers = list(
+                load_preprocessed(args.genome.name+".readmap").items()
+            )
+        except (FileNotFoundError, NotADirectoryError):
+            # No tables, or a pickle file from an older version
+            argparser.error(f"no preprocessed tables for "
+                            f"{args.genome.name}; run readmap -p first.")
+        reads = scan_reads(args.reads)
+        while batch := list(itertools.islice(reads, BATCH_SIZE)):
+            read_seqs = [read_seq for _, read_seq in batch]
+            # Collect the batch's output and write it in one go,
+            # rather than a print per hit
+            lines = []
+            for chr_name, search_many in genome_searchers:
+                for idx, i, cigar in search_many(read_seqs, args.d):
+                    read_name, read_seq = batch[idx]
+                    lines.append(ssam_line(read_name, chr_name,
+                                           i, cigar,
+                                           read_seq))
+            sys.stdout.write(''.join(lines))
 
 
 if __name__ == '__main__':
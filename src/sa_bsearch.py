@@ -4,11 +4,15 @@ from typing import (
 from dataclasses import (
     dataclass
 )
+import numpy as np
+import numpy.typing as npt
+
+from jit import njit
 
 
 @dataclass
 class SARange:
-    sa: list[int]
+    sa: npt.NDArray[np.int64]
     start: int
     stop: int
 
@@ -17,18 +21,9 @@ class SARange:
             yield self.sa[i]
 
 
-@dataclass
-class InfiniteString:
-    """Turns out-of-bounds index into sentinels."""
-    _x: str
-
-    def __getitem__(self, i: int) -> str:
-        return self._x[i] if i < len(self._x) else chr(0)
-
-
 class SearchSpace(NamedTuple):
-    x: InfiniteString
-    sa: list[int]
+    x: npt.NDArray[np.uint32]  # code points, terminated by a sentinel, 0
+    sa: npt.NDArray[np.int64]
 
 
 class SearchRange(NamedTuple):
@@ -37,25 +32,43 @@ class SearchRange(NamedTuple):
     hi: int
 
 
-def search_space(x: str, sa: list[int]) -> SearchSpace:
-    return SearchSpace(InfiniteString(x), sa)
+def search_space(x: str, sa: list[int] | npt.NDArray[np.int64]) \
+        -> SearchSpace:
+    """
+    Build the search space for x and its suffix array sa.
+
+    This copies x, so build it once per text and reuse it for all the
+    searches in that text.
+    """
+    # The sentinel is the only out-of-bounds index we can see: once a
+    # suffix has run out, it drops out of the block at that offset.
+    codes = np.frombuffer((x + chr(0)).encode('utf-32-le'), dtype=np.uint32)
+    return SearchSpace(codes, np.asarray(sa, dtype=np.int64))
 
 
 def search_range(offset: int, lo: int, hi: int) -> SearchRange:
     return SearchRange(offset, lo, hi)
 
 
+@njit(cache=True)
+def _lower(a: int, offset: int, lo: int, hi: int,
+           x: npt.NDArray[np.uint32], sa: npt.NDArray[np.int64]) -> int:
+    """Find the lower bound of code point a in sa[lo:hi] at offset."""
+    if lo == hi:
+        return lo
+    # Branchless form: move base up by half the block if the key just
+    # before the midpoint is smaller than a, and always halve the block.
+    base, n = lo, hi - lo
+    while n > 1:
+        half = n // 2
+        base += (x[sa[base + half - 1] + offset] < a) * half
+        n -= half
+    return base + (x[sa[base] + offset] < a)
+
+
 def lower(a: str, srange: SearchRange, space: SearchSpace) -> int:
     """Finds the lower bound of `a` in the block defined by `srange`."""
-    offset, lo, hi = srange
-    x, sa = space
-    while lo < hi:
-        m = (lo + hi) // 2
-        if x[sa[m] + offset] < a:
-            lo = m + 1
-        else:
-            hi = m
-    return lo
+    return int(_lower(ord(a), *srange, *space))
 
 
 def upper(a: str, srange: SearchRange, space: SearchSpace) -> int:
@@ -72,11 +85,66 @@ def block(a: str, srange: SearchRange, space: SearchSpace) -> SearchRange:
     )
 
 
-def sa_bsearch(p: str, x: str, sa: list[int]) -> SARange:
-    space = search_space(x, sa)
-    srange = search_range(0, 0, len(sa))
-    for a in p:
-        srange = block(a, srange, space)
-        if srange.lo == srange.hi:
+@njit(cache=True)
+def _bsearch(p: npt.NDArray[np.uint32],
+             x: npt.NDArray[np.uint32],
+             sa: npt.NDArray[np.int64]) -> tuple[int, int]:
+    """Narrow sa down to the block of suffixes that have p as a prefix."""
+    lo, hi = 0, len(sa)
+    for offset in range(len(p)):
+        lo, hi = (_lower(p[offset], offset, lo, hi, x, sa),
+                  _lower(p[offset] + 1, offset, lo, hi, x, sa))
+        if lo == hi:
             break
-    return SARange(sa, srange.lo, srange.hi)
+    return lo, hi
+
+
+def sa_bsearch(p: str, space: SearchSpace) -> SARange:
+    """
+    Find the block of suffixes in space that p is a prefix of.
+
+    This is block() for each letter in p, but the whole loop runs in
+    one compiled call, and the only thing we convert is p itself.
+    """
+    codes = np.frombuffer(p.encode('utf-32-le'), dtype=np.uint32)
+    lo, hi = _bsearch(codes, *space)
+    return SARange(space.sa, int(lo), int(hi))
+
+
+def _match_from(p: str, x: str, j: int, k: int) -> int:
+    """Extend a match of p[:k] at x[j:] as far as it goes."""
+    while k < len(p) and j + k < len(x) and x[j + k] == p[k]:
+        k += 1
+    return k
+
+
+def sa_lcp_search(p: str, x: str,
+                  sa: npt.NDArray[np.int64],
+                  lcp: npt.NDArray[np.int64]) -> SARange:
+    """
+    Search for p with one binary search over the whole pattern.
+
+    While we search, we keep track of how much of p the suffixes just
+    outside the search block, at lo-1 and hi, match. Every suffix in
+    between shares at least the smaller of the two with p, so we start
+    comparing from there instead of from the beginning of p. Once we
+    have the first suffix that p is a prefix of, the LCP array gives us
+    the rest of the block: it is the following suffixes that share at
+    least len(p) letters with their predecessor.
+    """
+    lo, hi = 0, len(sa)
+    lo_match = hi_match = 0
+    while lo < hi:
+        m = (lo + hi) // 2
+        k = _match_from(p, x, sa[m], min(lo_match, hi_match))
+        if k < len(p) and (sa[m] + k == len(x) or x[sa[m] + k] < p[k]):
+            lo, lo_match = m + 1, k
+        else:
+            hi, hi_match = m, k
+
+    if lo == len(sa) or _match_from(p, x, sa[lo], 0) < len(p):
+        return SARange(sa, lo, lo)
+    hi = lo + 1
+    while hi < len(sa) and lcp[hi] >= len(p):
+        hi += 1
+    return SARange(sa, lo, hi)
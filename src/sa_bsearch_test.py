@@ -1,11 +1,14 @@
+import numpy as np
+
 from sa_bsearch import (
     search_space,
     search_range,
     lower, upper, block,
-    sa_bsearch
+    sa_bsearch, sa_lcp_search
 )
 
-from sais import sais
+from sais import sais, lcp_array
+from test_helpers import random_string
 
 
 def test_mississippi():
@@ -42,22 +45,52 @@ def test_mississippi():
     res = block("p", srange, space)
     assert res.offset == 1 and res.lo == 6 and res.hi == 8
 
-    res = sa_bsearch("a", x, sa)
+    res = sa_bsearch("a", space)
     assert list(res) == []
 
-    res = sa_bsearch("x", x, sa)
+    res = sa_bsearch("x", space)
     assert list(res) == []
 
-    res = sa_bsearch("i", x, sa)
+    res = sa_bsearch("i", space)
     assert list(res) == [sa[j] for j in range(1, 5)]
 
-    res = sa_bsearch("p", x, sa)
+    res = sa_bsearch("p", space)
     assert list(res) == [sa[j] for j in range(6, 8)]
 
-    res = sa_bsearch("si", x, sa)
+    res = sa_bsearch("si", space)
     assert list(res) == [sa[j] for j in range(8, 10)]
 
 
+def test_lcp_search() -> None:
+    x = "mississippi"
+    sa = sais(x)
+    lcp = lcp_array(x, sa)
+    assert list(lcp) == [0, 0, 1, 1, 4, 0, 0, 1, 0, 2, 1, 3]
+
+    for _ in range(20):
+        x = random_string(200, alpha="acg")
+        sa = sais(x)
+        lcp = lcp_array(x, sa)
+        space = search_space(x, sa)
+        for p in ["a", "c", "gg", "acg", "t", x[:5], x[-3:], x[10:30]]:
+            assert list(sa_lcp_search(p, x, sa, lcp)) == \
+                list(sa_bsearch(p, space))
+
+
+def test_search_space_reused() -> None:
+    x = random_string(1000, alpha="acg")
+    sa = sais(x)
+    # An int64 suffix array goes into the search space without a copy,
+    # and the searches work on the space's arrays, not on new ones.
+    space = search_space(x, sa)
+    assert np.shares_memory(space.sa, sa)
+    for p in ["a", x[10:20], x[-5:]]:
+        res = sa_bsearch(p, space)
+        assert res.sa is space.sa
+        assert sorted(res) == [i for i in range(len(x))
+                               if x.startswith(p, i)]
+
+
 if __name__ == '__main__':
     for name, f in list(globals().items()):
         if name.startswith("test_"):
@@ -1,22 +1,24 @@
 """Implementation of the SAIS algorithm."""
 
-from array import array
 from typing import (
     TypeVar
 )
 # from collections.abc import (
 #     Sequence, MutableSequence
 # )
-from collections import Counter
+import numpy as np
+import numpy.typing as npt
 
 from alphabet import Alphabet
-from bitarray import bitarray
+from jit import HAVE_NUMBA
+import sais_numba
 
 T = TypeVar('T')
 UNDEFINED = -1  # Undefined val in SA
+Counts = npt.NDArray[np.int64]  # Letter counts, indexed by letter
 
 
-def classify_sl(is_s: bitarray, x: memoryview) -> None:
+def classify_sl(is_s: bytearray, x: memoryview) -> None:
     """Classify positions into S or L."""
     last = len(x) - 1
     is_s[last] = True
@@ -24,36 +26,51 @@ def classify_sl(is_s: bitarray, x: memoryview) -> None:
         is_s[i] = x[i] < x[i + 1] or (x[i] == x[i + 1] and is_s[i + 1])
 
 
-def compute_buckets(counts: Counter[int], asize: int) -> list[int]:
-    """Compute the bucket pointers from counts."""
-    buckets = [0] * (asize + 1)  # np.zeros(asize+1, dtype=np.int32)
-    for a in range(1, asize+1):
-        buckets[a] = buckets[a-1] + counts[a-1]
-    return buckets
+def lms_positions(is_s: bytearray, n: int) -> npt.NDArray[np.int64]:
+    """
+    Find the LMS positions in the first n entries of is_s.
 
+    A position is LMS if it is S and the one before it is L. Position
+    zero never is, so we compare is_s[1:n] with is_s[:n-1] in a single
+    vectorised pass over a zero-copy view of the bytes.
+    """
+    s = np.frombuffer(is_s, dtype=np.uint8, count=n)
+    return np.flatnonzero(s[1:] & (s[:-1] ^ 1)) + 1
 
-def bucket_lms(x: memoryview, asize: int,
+
+def compute_buckets(counts: Counts, asize: int) -> list[int]:
+    """
+    Compute the bucket pointers from counts.
+
+    The loops that use the buckets run in Python, and they index a
+    list faster than an array, so that is what we return.
+    """
+    buckets = np.zeros(asize + 1, dtype=np.int64)
+    np.cumsum(counts[:asize], out=buckets[1:])
+    return buckets.tolist()
+
+
+def bucket_lms(x: memoryview,
                sa: memoryview,
-               counts: Counter[int],
-               is_s: bitarray) \
+               buckets: list[int],
+               lms: npt.NDArray[np.int64]) \
         -> None:
     """Place LMS strings in their correct buckets."""
-    buckets = compute_buckets(counts, asize)
+    buckets = buckets.copy()
     for i in range(len(sa)):
         sa[i] = UNDEFINED
-    for i, _ in enumerate(x):
-        if is_s[i] and not is_s[i-1]:
-            buckets[x[i]+1] -= 1
-            sa[buckets[x[i]+1]] = i
+    for i in lms.tolist():
+        buckets[x[i]+1] -= 1
+        sa[buckets[x[i]+1]] = i
 
 
-def induce_l(x: memoryview, asize: int,
+def induce_l(x: memoryview,
              sa: memoryview,
-             counts: Counter[int],
-             is_s: bitarray) \
+             buckets: list[int],
+             is_s: bytearray) \
         -> None:
     """Induce L suffixes from the LMS strings."""
-    buckets = compute_buckets(counts, asize)
+    buckets = buckets.copy()
     for i in range(len(x)):
         j = sa[i] - 1
         if sa[i] in (0, UNDEFINED) or is_s[j]:
@@ -62,13 +79,13 @@ def induce_l(x: memoryview, asize: int,
         buckets[x[j]] += 1
 
 
-def induce_s(x: memoryview, asize: int,
+def induce_s(x: memoryview,
              sa: memoryview,
-             counts: Counter[int],
-             is_s: bitarray) \
+             buckets: list[int],
+             is_s: bytearray) \
         -> None:
     """Induce S suffixes from the L suffixes."""
-    buckets = compute_buckets(counts, asize)
+    buckets = buckets.copy()
     for i in reversed(range(len(x))):
         j = sa[i] - 1
         if sa[i] == 0 or not is_s[j]:
@@ -77,7 +94,7 @@ def induce_s(x: memoryview, asize: int,
         sa[buckets[x[j]+1]] = j
 
 
-def equal_lms(x: memoryview, is_s: bitarray, i: int, j: int) -> bool:
+def equal_lms(x: memoryview, is_s: bytearray, i: int, j: int) -> bool:
     """Test if two LMS strings are identical."""
     if i == j:
         # This happens as a special case in the beginning of placing them.
@@ -100,16 +117,17 @@ def equal_lms(x: memoryview, is_s: bitarray, i: int, j: int) -> bool:
     return False  # just for the linter
 
 
-def reduce_lms(x: memoryview, sa: memoryview, is_s: bitarray) \
+def reduce_lms(x: memoryview, sa: memoryview, is_s: bytearray,
+               lms: npt.NDArray[np.int64]) \
         -> tuple[memoryview, memoryview, int]:
     """Construct reduced string from LMS strings."""
     # Compact all the LMS indices in the first
-    # part of the suffix array...
-    k = 0
-    for i in sa:
-        if is_s[i] and not is_s[i-1]:
-            sa[k] = i
-            k += 1
+    # part of the suffix array, keeping their order...
+    k = len(lms)
+    is_lms = np.zeros(len(sa), dtype=np.bool_)
+    is_lms[lms] = True
+    sa_ = np.asarray(sa)
+    sa_[:k] = sa_[is_lms[sa_]]
 
     # Create the alphabet and write the translation
     # into the buffer in the right order
@@ -133,21 +151,16 @@ def reduce_lms(x: memoryview, sa: memoryview, is_s: bitarray) \
     return buffer[:k], compact, letter + 1
 
 
-def reverse_reduction(x: memoryview, asize: int,
+def reverse_reduction(x: memoryview,
                       sa: memoryview,
                       offsets: memoryview,
                       red_sa: memoryview,
-                      counts: Counter[int],
-                      is_s: bitarray) -> None:
+                      buckets: list[int],
+                      lms: npt.NDArray[np.int64]) -> None:
     """Get the LMS string order back from the reduced suffix array."""
-    # Work out where the LMS strings are in the
-    # original string. Compact those indices
-    # into the buffer offsets
-    k = 0
-    for i in range(len(x)):
-        if is_s[i] and not is_s[i-1]:
-            offsets[k] = i
-            k += 1
+    # The LMS strings' positions in the original
+    # string go in the buffer offsets
+    np.asarray(offsets)[:len(lms)] = lms
 
     # Compact the original indices into sa
     for i, j in enumerate(red_sa):
@@ -157,7 +170,7 @@ def reverse_reduction(x: memoryview, asize: int,
     for i in range(len(red_sa), len(sa)):
         sa[i] = UNDEFINED
 
-    buckets = compute_buckets(counts, asize)
+    buckets = buckets.copy()
     for i in reversed(range(len(red_sa))):
         j, red_sa[i] = red_sa[i], UNDEFINED
         buckets[x[j]+1] -= 1
@@ -165,7 +178,7 @@ def reverse_reduction(x: memoryview, asize: int,
 
 
 def sais_rec(x: memoryview, sa: memoryview,
-             asize: int, is_s: bitarray) -> None:
+             asize: int, is_s: bytearray) -> None:
     """Recursive SAIS algorithm."""
     if len(x) == asize:
         # base case...
@@ -174,31 +187,75 @@ def sais_rec(x: memoryview, sa: memoryview,
 
     else:  # recursive case...
         classify_sl(is_s, x)
-        counts = Counter(x)
-        bucket_lms(x, asize, sa, counts, is_s)
-        induce_l(x, asize, sa, counts, is_s)
-        induce_s(x, asize, sa, counts, is_s)
+        lms = lms_positions(is_s, len(x))
+        # The buckets only depend on the letter counts, so we compute
+        # them once per level; each step works on its own copy.
+        counts = np.bincount(np.asarray(x), minlength=asize)
+        buckets = compute_buckets(counts, asize)
+        bucket_lms(x, sa, buckets, lms)
+        induce_l(x, sa, buckets, is_s)
+        induce_s(x, sa, buckets, is_s)
 
-        red, red_sa, red_asize = reduce_lms(x, sa, is_s)
+        red, red_sa, red_asize = reduce_lms(x, sa, is_s, lms)
 
         sais_rec(red, red_sa, red_asize, is_s)
         # restore state...
         classify_sl(is_s, x)
 
-        reverse_reduction(x, asize, sa, red, red_sa, counts, is_s)
-        induce_l(x, asize, sa, counts, is_s)
-        induce_s(x, asize, sa, counts, is_s)
+        reverse_reduction(x, sa, red, red_sa, buckets, lms)
+        induce_l(x, sa, buckets, is_s)
+        induce_s(x, sa, buckets, is_s)
+
 
+def sais_alphabet(x: bytearray | npt.NDArray[np.uint8],
+                  alpha: Alphabet) -> npt.NDArray[np.int64]:
+    """
+    Run the sais algorithm from a subsequence and an alphabet.
 
-def sais_alphabet(x: array, alpha: Alphabet) -> array:
-    """Run the sais algorithm from a subsequence and an alphabet."""
-    sa = array('l', [0] * len(x))
-    is_s = bitarray(len(x))
-    sais_rec(memoryview(x), memoryview(sa), len(alpha), is_s)
+    With numba, we run the compiled version from sais_numba.
+    """
+    x_ = np.frombuffer(x, dtype=np.uint8)
+    if HAVE_NUMBA:
+        return sais_numba.sais_array(x_, len(alpha))
+
+    sa = np.zeros(len(x), dtype=np.int64)
+    is_s = bytearray(len(x))
+    # ndarray.data is a memoryview of the array's buffer
+    sais_rec(x_.data, sa.data, len(alpha), is_s)
     return sa
 
 
-def sais(x: str) -> array:
+def sais(x: str) -> npt.NDArray[np.int64]:
     """Run the sais algorithm from a string."""
     x_, alpha = Alphabet.mapped_subseq_with_sentinel(x)
     return sais_alphabet(x_, alpha)
+
+
+def lcp_array(x: str, sa: npt.NDArray[np.int64]) -> npt.NDArray[np.int64]:
+    """
+    Compute the LCP array for x and its suffix array (Kasai et al.).
+
+    lcp[i] is the length of the longest common prefix of the suffixes
+    sa[i-1] and sa[i], and lcp[0] is zero. We go through the suffixes
+    in the order they have in x, and since the suffix at i+1 shares
+    at least one less letter with its predecessor than the suffix at
+    i did, we never rewind the matched length by more than one.
+    """
+    n = len(sa)
+    rank = [0] * n
+    for i, j in enumerate(sa.tolist()):
+        rank[j] = i
+
+    sa_ = sa.tolist()
+    lcp = [0] * n
+    k = 0
+    for i in range(len(x)):
+        if rank[i] == 0:
+            k = 0
+            continue
+        j = sa_[rank[i] - 1]
+        while i + k < len(x) and j + k < len(x) and x[i + k] == x[j + k]:
+            k += 1
+        lcp[rank[i]] = k
+        k = max(k - 1, 0)
+    return np.array(lcp, dtype=np.int64)
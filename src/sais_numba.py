@@ -0,0 +1,231 @@
+"""
+The SAIS algorithm with its loops compiled by numba.
+
+This is the algorithm from sais.py, step for step, but on NumPy arrays
+rather than memoryviews, so numba can compile the loops to native
+code. Numba doesn't know bitarray, so is_s is a uint8 array instead.
+The recursion itself stays in Python, in sais_rec; it is only called
+O(log n) times, while the loops it calls run over the whole string.
+"""
+
+from typing import Any
+import numpy as np
+import numpy.typing as npt
+
+from jit import njit
+
+UNDEFINED = -1  # Undefined val in SA
+
+# The string we sort is bytes at the top level, but the reduced
+# strings in the recursion live in the suffix array's buffer.
+String = npt.NDArray[np.integer[Any]]
+SuffixArray = npt.NDArray[np.int64]
+SLTypes = npt.NDArray[np.uint8]
+
+
+@njit(cache=True)
+def classify_sl(is_s: SLTypes, x: String) -> None:
+    """Classify positions into S or L."""
+    last = len(x) - 1
+    is_s[last] = True
+    for i in range(len(x)-2, -1, -1):
+        is_s[i] = x[i] < x[i + 1] or (x[i] == x[i + 1] and is_s[i + 1])
+
+
+@njit(cache=True)
+def lms_positions(is_s: SLTypes, n: int) -> SuffixArray:
+    """Find the LMS positions in the first n entries of is_s."""
+    k = 0
+    for i in range(1, n):
+        if is_s[i] and not is_s[i-1]:
+            k += 1
+    lms = np.empty(k, dtype=np.int64)
+    k = 0
+    for i in range(1, n):
+        if is_s[i] and not is_s[i-1]:
+            lms[k] = i
+            k += 1
+    return lms
+
+
+@njit(cache=True)
+def compute_buckets(counts: SuffixArray, asize: int) -> SuffixArray:
+    """Compute the bucket pointers from counts."""
+    buckets = np.zeros(asize + 1, dtype=np.int64)
+    for a in range(1, asize+1):
+        buckets[a] = buckets[a-1] + counts[a-1]
+    return buckets
+
+
+@njit(cache=True)
+def bucket_lms(x: String,
+               sa: SuffixArray,
+               buckets: SuffixArray,
+               lms: SuffixArray) -> None:
+    """Place LMS strings in their correct buckets."""
+    buckets = buckets.copy()
+    for i in range(len(sa)):
+        sa[i] = UNDEFINED
+    for i in lms:
+        buckets[x[i]+1] -= 1
+        sa[buckets[x[i]+1]] = i
+
+
+@njit(cache=True)
+def induce_l(x: String,
+             sa: SuffixArray,
+             buckets: SuffixArray,
+             is_s: SLTypes) -> None:
+    """Induce L suffixes from the LMS strings."""
+    buckets = buckets.copy()
+    for i in range(len(x)):
+        j = sa[i] - 1
+        if sa[i] == 0 or sa[i] == UNDEFINED or is_s[j]:
+            continue
+        sa[buckets[x[j]]] = j
+        buckets[x[j]] += 1
+
+
+@njit(cache=True)
+def induce_s(x: String,
+             sa: SuffixArray,
+             buckets: SuffixArray,
+             is_s: SLTypes) -> None:
+    """Induce S suffixes from the L suffixes."""
+    buckets = buckets.copy()
+    for i in range(len(x)-1, -1, -1):
+        j = sa[i] - 1
+        if sa[i] == 0 or not is_s[j]:
+            continue
+        buckets[x[j]+1] -= 1
+        sa[buckets[x[j]+1]] = j
+
+
+@njit(cache=True)
+def assign_lms_names(x: String, lms: SuffixArray,
+                     compact: SuffixArray, buffer: SuffixArray) -> int:
+    """
+    Give the LMS strings, sorted in compact, letters in buffer[j // 2].
+
+    LMS positions are at least two apart, so the slots buffer[j // 2]
+    are distinct. We first use them to remember the length of each
+    LMS string, up to the next LMS position, and then overwrite them
+    with the letters. Two LMS strings are equal if they have the same
+    length and letters, so we never need to look at is_s to find where
+    they end. The last LMS string is the sentinel; we give it length
+    zero, and since the sentinel is unique it is never equal to another.
+    """
+    for t in range(len(lms) - 1):
+        buffer[lms[t] // 2] = lms[t + 1] - lms[t]
+    buffer[lms[-1] // 2] = 0
+
+    prev, prev_len, letter = compact[0], buffer[compact[0] // 2], 0
+    for j in compact:
+        length = buffer[j // 2]
+        equal = length == prev_len
+        k = 0
+        while equal and k <= length:
+            equal = x[j + k] == x[prev + k]
+            k += 1
+        if not equal:
+            letter += 1
+        buffer[j // 2] = letter
+        prev, prev_len = j, length
+    return letter
+
+
+@njit(cache=True)
+def reduce_lms(x: String, sa: SuffixArray, is_s: SLTypes,
+               lms: SuffixArray) \
+        -> tuple[SuffixArray, SuffixArray, int]:
+    """Construct reduced string from LMS strings."""
+    # Compact all the LMS indices in the first
+    # part of the suffix array...
+    k = 0
+    for ii in range(len(sa)):
+        i = sa[ii]
+        if is_s[i] and not is_s[i-1]:
+            sa[k] = i
+            k += 1
+
+    # Create the alphabet and write the translation
+    # into the buffer in the right order
+    compact, buffer = sa[:k], sa[k:]
+    for i in range(len(buffer)):
+        buffer[i] = UNDEFINED
+    letter = assign_lms_names(x, lms, compact, buffer)
+
+    # Then compact the buffer into the reduced string
+    kk = 0
+    for ii in range(len(buffer)):
+        i = buffer[ii]
+        if i != UNDEFINED:
+            buffer[kk] = i
+            kk += 1
+
+    return buffer[:k], compact, letter + 1
+
+
+@njit(cache=True)
+def reverse_reduction(x: String,
+                      sa: SuffixArray,
+                      offsets: SuffixArray,
+                      red_sa: SuffixArray,
+                      buckets: SuffixArray,
+                      lms: SuffixArray) -> None:
+    """Get the LMS string order back from the reduced suffix array."""
+    # The LMS strings' positions in the original
+    # string go in the buffer offsets
+    for k in range(len(lms)):
+        offsets[k] = lms[k]
+
+    # Compact the original indices into sa
+    for i in range(len(red_sa)):
+        sa[i] = offsets[red_sa[i]]
+
+    # Mark the sa after the LMS indices as undefined
+    for i in range(len(red_sa), len(sa)):
+        sa[i] = UNDEFINED
+
+    buckets = buckets.copy()
+    for i in range(len(red_sa)-1, -1, -1):
+        j, red_sa[i] = red_sa[i], UNDEFINED
+        buckets[x[j]+1] -= 1
+        sa[buckets[x[j]+1]] = j
+
+
+def sais_rec(x: String, sa: SuffixArray,
+             asize: int, is_s: SLTypes) -> None:
+    """Recursive SAIS algorithm."""
+    if len(x) == asize:
+        # base case...
+        sa[x] = np.arange(len(x))
+
+    else:  # recursive case...
+        classify_sl(is_s, x)
+        lms = lms_positions(is_s, len(x))
+        # The buckets only depend on the letter counts, so we compute
+        # them once per level; each step works on its own copy.
+        counts = np.bincount(x, minlength=asize)
+        buckets = compute_buckets(counts, asize)
+        bucket_lms(x, sa, buckets, lms)
+        induce_l(x, sa, buckets, is_s)
+        induce_s(x, sa, buckets, is_s)
+
+        red, red_sa, red_asize = reduce_lms(x, sa, is_s, lms)
+
+        sais_rec(red, red_sa, red_asize, is_s)
+        # restore state...
+        classify_sl(is_s, x)
+
+        reverse_reduction(x, sa, red, red_sa, buckets, lms)
+        induce_l(x, sa, buckets, is_s)
+        induce_s(x, sa, buckets, is_s)
+
+
+def sais_array(x: String, asize: int) -> SuffixArray:
+    """Run the sais algorithm on an array over an alphabet of size asize."""
+    sa = np.zeros(len(x), dtype=np.int64)
+    is_s = np.zeros(len(x), dtype=np.uint8)
+    sais_rec(x, sa, asize, is_s)
+    return sa
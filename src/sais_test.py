@@ -1,14 +1,14 @@
 """Test of sais algorithm."""
 
-from array import array
+import numpy as np
 from test_helpers import (
     check_sorted,
     fibonacci_string,
     random_string
 )
 from alphabet import Alphabet
-from bitarray import bitarray
-from sais import classify_sl, sais
+from sais import classify_sl, sais, sais_rec
+from sais_numba import sais_array
 
 
 def test_remap() -> None:
@@ -31,10 +31,10 @@ def test_classify() -> None:
     x, _ = Alphabet.mapped_subseq_with_sentinel("mississippi")
     assert len(x) == len("mississippi") + 1
 
-    is_s = bitarray(len(x))
+    is_s = bytearray(len(x))
     assert len(is_s) == len(x)
 
-    classify_sl(is_s, memoryview(x))
+    classify_sl(is_s, x.data)
 
     expected = [
         # L    S     L      L      S     L      L
@@ -48,9 +48,9 @@ def test_classify() -> None:
 
 def test_base_case() -> None:
     """Test that we can sort base cases."""
-    assert sais("abc") == array('l', [3, 0, 1, 2])
-    assert sais("cba") == array('l', [3, 2, 1, 0])
-    assert sais("acb") == array('l', [3, 0, 2, 1])
+    assert list(sais("abc")) == [3, 0, 1, 2]
+    assert list(sais("cba")) == [3, 2, 1, 0]
+    assert list(sais("acb")) == [3, 0, 2, 1]
 
 
 def test_mississippi() -> None:
@@ -74,6 +74,17 @@ def test_sais_sorted() -> None:
         check_sorted(x, sa)
 
 
+def test_sais_numba_agrees() -> None:
+    """Test that the compiled sais agrees with the Python version."""
+    for x in [random_string(1000) for _ in range(10)] + \
+             [fibonacci_string(n) for n in range(10, 15)]:
+        x_, alpha = Alphabet.mapped_subseq_with_sentinel(x)
+        sa = np.zeros(len(x_), dtype=np.int64)
+        sais_rec(x_.data, sa.data, len(alpha),
+                 bytearray(len(x_)))
+        assert list(sais_array(x_, len(alpha))) == list(sa)
+
+
 if __name__ == '__main__':
     globs = list(globals().items())
     for name, f in globs:
@@ -1,16 +1,24 @@
 """Writing hits to "simple"-SAM format."""
 
 from typing import TextIO
+from approx import LazyCigar
 
 
-def ssam_record(out: TextIO,
-                sname: str, rname: str,
-                pos: int, cigar: str,
-                read: str) -> None:
-    """Write location of a match as simple-sam format.
+def ssam_line(sname: str, rname: str,
+              pos: int, cigar: str | LazyCigar,
+              read: str) -> str:
+    """Format the location of a match as a simple-sam line.
 
     The "simple" SAM format is like the SAM format, except that we only
     write the fields we use in the GSA class, so we write tab-separated
     columns of sequence name, read name, position, cigar and read.
     """
-    print(sname, rname, pos+1, cigar, read, sep='\t', file=out)
+    return f"{sname}\t{rname}\t{pos+1}\t{cigar}\t{read}\n"
+
+
+def ssam_record(out: TextIO,
+                sname: str, rname: str,
+                pos: int, cigar: str | LazyCigar,
+                read: str) -> None:
+    """Write location of a match as simple-sam format (see ssam_line)."""
+    out.write(ssam_line(sname, rname, pos, cigar, read))
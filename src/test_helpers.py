@@ -1,9 +1,10 @@
 """Helper functions for testing."""
 
-from array import array
 import random
 import string
-from collections.abc import Callable, Iterable, Iterator
+from collections.abc import Callable, Iterable, Iterator, Sequence
+import numpy as np
+import numpy.typing as npt
 
 # I'm not sure about the prototype here. I think I want
 # to allow any number of paramters, if pytest can add
@@ -70,7 +71,8 @@ def pick_random_suffix(x: str, n: int) -> Iterator[str]:
         yield x[i:]
 
 
-def check_sorted(x: str, sa: array) -> None:
+def check_sorted(x: str,
+                 sa: Sequence[int] | npt.NDArray[np.int64]) -> None:
     """Check that the suffixes in sa are sorted."""
     assert x != ""
     assert len(x) == len(sa) or len(x) + 1 == len(sa)